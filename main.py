@@ -1,12 +1,635 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
+import argparse
+import array
+import asyncio
+import concurrent.futures
 import csv
+import json
+import math
 import os
+import queue
+import sys
+import threading
+import zlib
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+import numpy as np
 import pandas as pd
 from pypinyin import pinyin, Style
 import configparser
 
 
+class GradeRegistry:
+    """等级注册表
+
+    等级按从低到高的顺序登记，排序权重、表格标签和显示用的等级列表都在创建时计算好，
+    加载、排序、筛选和显示时直接查表使用。
+    """
+
+    section = "Grades"
+
+    # 默认等级及颜色（从低到高）
+    default_grades = [
+        ("青铜", "#CD7F32"),
+        ("白银", "#C0C0C0"),
+        ("黄金", "#FFD700"),
+        ("钻石", "#B9F2FF"),
+        ("珍禽异兽", "#800080")
+    ]
+
+    def __init__(self, grades=None):
+        grades = list(grades or self.default_grades)
+
+        # 显示用的等级列表（从低到高）
+        self.names = [name for name, _ in grades]
+        # 等级 -> 颜色
+        self.colors = dict(grades)
+        # 等级 -> 排序权重
+        self.weights = {name: i + 1 for i, name in enumerate(self.names)}
+        # 等级 -> 表格行标签
+        self.tags = {name: (f"grade_{i + 1}",) for i, name in enumerate(self.names)}
+
+    @classmethod
+    def from_config(cls, config):
+        """从配置中读取等级，没有配置时使用默认等级"""
+        if not config.has_section(cls.section) or not config.items(cls.section):
+            return cls()
+        return cls([(name, color.strip()) for name, color in config.items(cls.section)])
+
+    def to_config(self, config):
+        """将等级写入配置"""
+        config[self.section] = self.colors
+
+    def configure_tags(self, table):
+        """为表格配置各等级的行颜色"""
+        for name in self.names:
+            table.tag_configure(self.tags[name][0], foreground=self.colors[name])
+
+
+class TrophyIndex:
+    """战利品数据的查询索引
+
+    为每个等级预先建立位图，并按评分建立排序索引，
+    筛选时先用索引求交集，只对剩余的候选行做文本匹配，避免全表扫描。
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self.size = len(df)
+
+        # 等级位图：等级 -> 布尔数组
+        grades = df["grade"].to_numpy()
+        self.grade_bitmaps = {grade: grades == grade for grade in pd.unique(grades)}
+
+        # 评分排序索引：无法解析的评分视为NaN，排在最后，不会落入任何评分范围
+        scores = pd.to_numeric(df["score"], errors="coerce").to_numpy(dtype=float)
+        self.score_order = np.argsort(scores, kind="mergesort")
+        self.sorted_scores = scores[self.score_order]
+        self.valid_score_count = int(np.count_nonzero(~np.isnan(scores)))
+
+    def grade_mask(self, grades):
+        """返回属于指定等级集合的行位图"""
+        mask = np.zeros(self.size, dtype=bool)
+        for grade in grades:
+            bitmap = self.grade_bitmaps.get(grade)
+            if bitmap is not None:
+                mask |= bitmap
+        return mask
+
+    def score_mask(self, min_score=None, max_score=None):
+        """返回评分在 [min_score, max_score] 范围内的行位图"""
+        # 只在有效评分部分查找，末尾的NaN不计入任何范围
+        valid_scores = self.sorted_scores[:self.valid_score_count]
+        start = 0 if min_score is None else np.searchsorted(valid_scores, min_score, side="left")
+        end = len(valid_scores) if max_score is None else np.searchsorted(valid_scores, max_score, side="right")
+        mask = np.zeros(self.size, dtype=bool)
+        mask[self.score_order[start:end]] = True
+        return mask
+
+    def query(self, grades=None, min_score=None, max_score=None, species=None, color=None):
+        """按条件筛选数据，返回符合条件的行（保持原有顺序）"""
+        mask = np.ones(self.size, dtype=bool)
+        if grades is not None:
+            mask &= self.grade_mask(grades)
+        if min_score is not None or max_score is not None:
+            mask &= self.score_mask(min_score, max_score)
+
+        result = self.df.iloc[np.flatnonzero(mask)]
+
+        # 文本条件只在候选行上匹配
+        if species:
+            result = result[result["species"].str.contains(species, case=False, na=False, regex=False)]
+        if color:
+            result = result[result["color"].str.contains(color, case=False, na=False, regex=False)]
+
+        return result
+
+
+class TrophyValidator:
+    """CSV数据完整性检查器
+
+    只顺序读取文件一次，内存占用与行数无关：
+    ID去重使用以ID为下标的数组，记录每个ID首次出现时整行内容的CRC32，
+    用来区分完全重复的行和只是ID冲突的行；每类问题只保留前若干个示例行号。
+    修复模式下边读边写入临时文件，无法修复的行写入 .rejected.csv，完全重复的行直接丢弃，
+    需要重新分配ID的行先暂存到单独的临时文件，读完后再以最大ID之后的编号追加。
+    """
+
+    fieldnames = ["species", "color", "grade", "score", "id"]
+
+    # 每类问题保留的示例行号数量
+    max_examples = 10
+
+    # 超过该值的ID改用字典记录，避免数组过大
+    max_array_id = 1 << 24
+
+    def __init__(self, csv_path, grades):
+        self.csv_path = csv_path
+        self.grades = set(grades)
+
+    def check(self):
+        """只检查不修改文件，返回问题汇总"""
+        return self.run(repair=False)
+
+    def repair(self):
+        """检查并修复文件，原文件备份为 .bak，返回问题汇总"""
+        return self.run(repair=True)
+
+    def run(self, repair=False):
+        """逐行检查CSV文件，返回 {问题类型: {"count": 数量, "lines": 示例行号}}"""
+        self.issues = {}
+        self.notices = []
+        self.rejected_count = 0
+        self.seen_hashes = array.array("I")
+        self.seen_large = {}
+
+        # 以surrogateescape方式读取，非UTF-8字节会保留下来供检查和修复
+        with open(self.csv_path, "r", encoding="utf-8", errors="surrogateescape", newline="") as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header is None:
+                self.add_issue("文件为空", 1)
+                if repair:
+                    # 写入表头，使文件可以正常加载
+                    with open(self.csv_path, "w", encoding="utf-8-sig", newline="") as empty_file:
+                        csv.writer(empty_file).writerow(self.fieldnames)
+                return self.issues
+
+            columns = self.check_header(header)
+
+            if not repair:
+                for row in reader:
+                    if row:
+                        self.check_row(row, columns, reader.line_num)
+                return self.issues
+
+            temp_path = self.csv_path + ".tmp"
+            pending_path = self.csv_path + ".pending"
+            rejected_path = self.csv_path + ".rejected.csv"
+            max_id = 0
+
+            with open(temp_path, "w", encoding="utf-8-sig", newline="") as temp_file, \
+                    open(pending_path, "w", encoding="utf-8", newline="") as pending_file, \
+                    open(rejected_path, "w", encoding="utf-8-sig", newline="") as rejected_file:
+                temp_writer = csv.writer(temp_file)
+                pending_writer = csv.writer(pending_file)
+                rejected_writer = csv.writer(rejected_file)
+                temp_writer.writerow(self.fieldnames)
+                rejected_writer.writerow(["line"] + self.fieldnames)
+
+                for row in reader:
+                    if not row:
+                        continue
+                    action, record, trophy_id = self.check_row(row, columns, reader.line_num)
+                    if action == "reject":
+                        rejected_writer.writerow([reader.line_num] + [
+                            value.encode("utf-8", "surrogateescape").decode("utf-8", "replace")
+                            for value in row
+                        ])
+                        self.rejected_count += 1
+                    elif action == "renumber":
+                        pending_writer.writerow(record)
+                    elif action == "keep":
+                        temp_writer.writerow(record + [trophy_id])
+                        max_id = max(max_id, trophy_id)
+
+            # 为ID无效或重复的行追加新的ID
+            with open(pending_path, "r", encoding="utf-8", newline="") as pending_file, \
+                    open(temp_path, "a", encoding="utf-8-sig", newline="") as temp_file:
+                temp_writer = csv.writer(temp_file)
+                for record in csv.reader(pending_file):
+                    max_id += 1
+                    temp_writer.writerow(record + [max_id])
+
+        os.remove(pending_path)
+        if self.rejected_count == 0:
+            os.remove(rejected_path)
+
+        # 备份原文件后替换
+        os.replace(self.csv_path, self.csv_path + ".bak")
+        os.replace(temp_path, self.csv_path)
+        return self.issues
+
+    def add_issue(self, kind, line_num):
+        """记录一个问题"""
+        issue = self.issues.setdefault(kind, {"count": 0, "lines": []})
+        issue["count"] += 1
+        if len(issue["lines"]) < self.max_examples:
+            issue["lines"].append(line_num)
+
+    def check_header(self, header):
+        """检查表头和BOM，返回各列在行中的位置"""
+        first = header[0]
+        bom_count = len(first) - len(first.lstrip("\ufeff"))
+        if bom_count == 0:
+            # 不带BOM的UTF-8文件也能正常加载，只作提示
+            self.notices.append("文件缺少BOM，修复后会加上BOM")
+        elif bom_count > 1:
+            self.add_issue("重复BOM", 1)
+
+        names = [name.strip("\ufeff").strip() for name in header]
+        missing = [name for name in self.fieldnames if name not in names]
+        if missing:
+            raise ValueError(f"缺少必要的列: {', '.join(missing)}")
+        if names != self.fieldnames:
+            self.add_issue("表头格式错误", 1)
+
+        self.header_size = len(header)
+        return [names.index(name) for name in self.fieldnames]
+
+    def check_row(self, row, columns, line_num):
+        """检查一行数据，返回 (处理方式, 修复后的记录, 可保留的ID)
+
+        处理方式：keep 保留原ID；renumber ID无效或冲突，需要重新分配；
+        reject 无法修复；drop 与之前的行完全重复，直接丢弃。
+        """
+        if len(row) <= max(columns):
+            self.add_issue("列数不足", line_num)
+            return "reject", None, None
+
+        if len(row) > self.header_size:
+            self.add_issue("列数过多", line_num)
+            return "reject", None, None
+
+        record = []
+        for value in (row[i] for i in columns):
+            if "\ufeff" in value:
+                self.add_issue("字段含BOM", line_num)
+                value = value.replace("\ufeff", "")
+            if any("\udc80" <= ch <= "\udcff" for ch in value):
+                self.add_issue("编码错误", line_num)
+                value = self.fix_encoding(value)
+                if value is None:
+                    return "reject", None, None
+            record.append(value.strip())
+
+        species, color, grade, score, raw_id = record
+
+        if not species or not color:
+            self.add_issue("字段为空", line_num)
+            return "reject", None, None
+
+        if grade not in self.grades:
+            self.add_issue("等级未知", line_num)
+            return "reject", None, None
+
+        try:
+            score = float(score)
+        except ValueError:
+            self.add_issue("评分无效", line_num)
+            return "reject", None, None
+        if not math.isfinite(score):
+            self.add_issue("评分无效", line_num)
+            return "reject", None, None
+        if score < 0:
+            self.add_issue("评分为负", line_num)
+            return "reject", None, None
+
+        record = [species, color, grade, "{:.2f}".format(score)]
+
+        try:
+            trophy_id = int(raw_id)
+            if trophy_id <= 0:
+                raise ValueError(raw_id)
+        except ValueError:
+            self.add_issue("ID无效", line_num)
+            return "renumber", record, None
+
+        # 0表示未出现过，CRC32恰好为0时改记为1
+        row_hash = zlib.crc32("\x1f".join(record + [str(trophy_id)]).encode("utf-8")) or 1
+        seen_hash = self.mark_seen(trophy_id, row_hash)
+        if seen_hash == row_hash:
+            self.add_issue("重复记录", line_num)
+            return "drop", None, None
+        if seen_hash:
+            self.add_issue("ID重复", line_num)
+            return "renumber", record, None
+
+        return "keep", record, trophy_id
+
+    def mark_seen(self, trophy_id, row_hash):
+        """记录ID首次出现时的整行哈希，返回此前记录的哈希（未出现过返回0）"""
+        if trophy_id >= self.max_array_id:
+            seen_hash = self.seen_large.get(trophy_id, 0)
+            if not seen_hash:
+                self.seen_large[trophy_id] = row_hash
+            return seen_hash
+
+        if trophy_id >= len(self.seen_hashes):
+            # 按倍数扩容，减少扩容次数
+            size = max(trophy_id + 1 - len(self.seen_hashes), len(self.seen_hashes))
+            self.seen_hashes.frombytes(bytes(size * self.seen_hashes.itemsize))
+        seen_hash = self.seen_hashes[trophy_id]
+        if not seen_hash:
+            self.seen_hashes[trophy_id] = row_hash
+        return seen_hash
+
+    @staticmethod
+    def fix_encoding(value):
+        """尝试将非UTF-8字段按GBK重新解码，失败返回None"""
+        try:
+            return value.encode("utf-8", "surrogateescape").decode("gbk")
+        except UnicodeDecodeError:
+            return None
+
+    @staticmethod
+    def format_report(issues, notices=()):
+        """将问题汇总和提示格式化为文本"""
+        lines = []
+        for kind, issue in issues.items():
+            examples = ", ".join(str(line_num) for line_num in issue["lines"])
+            lines.append(f"{kind}: {issue['count']} 处（行 {examples}）")
+        if not issues:
+            lines.append("未发现问题")
+        lines.extend(f"提示: {notice}" for notice in notices)
+        return "\n".join(lines)
+
+
+class TrophyServer:
+    """本地HTTP/JSON查询服务
+
+    在后台线程中运行asyncio服务，只监听本机地址，直接使用 TrophyManager 已加载的数据和索引。
+    GET请求的响应按数据版本缓存，数据重新加载（添加、修改、删除、刷新）后缓存自动失效。
+    添加操作提交到界面线程执行，与界面上的修改共用同一条写入路径。
+    Host和Origin不是本机地址的请求一律拒绝，添加接口只接受application/json请求体，
+    避免浏览器中的网页通过跨站请求或DNS重绑定访问服务。
+
+    接口：
+        GET  /trophies  按条件查询，参数 grade(可多个)、min_score、max_score、species、color、
+                        sort(species/grade/score/id)、order(asc/desc)、limit、offset
+        GET  /search    按物种模糊搜索，参数 q，其余参数同 /trophies
+        GET  /stats     统计信息
+        POST /trophies  添加战利品，JSON请求体 {"species", "color", "grade", "score"}
+    """
+
+    columns = ["species", "color", "grade", "score", "id"]
+    sort_keys = ["species", "grade", "score", "id"]
+
+    # 单次查询默认和最多返回的行数
+    default_limit = 100
+    max_limit = 10000
+
+    # 缓存的响应数量上限和请求体大小上限
+    max_cache_entries = 256
+    max_body_size = 65536
+
+    def __init__(self, manager, host="127.0.0.1", port=8765):
+        self.manager = manager
+        self.host = host
+        self.port = port
+        self.cache = {}
+        self.cache_version = None
+        self.loop = None
+
+    def start(self):
+        """在后台线程中启动服务，端口绑定失败时抛出异常"""
+        started = concurrent.futures.Future()
+        thread = threading.Thread(target=self.run, args=(started,), daemon=True)
+        thread.start()
+        started.result()
+
+    def run(self, started):
+        """后台线程入口"""
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            server = self.loop.run_until_complete(
+                asyncio.start_server(self.handle, self.host, self.port))
+        except Exception as e:
+            started.set_exception(e)
+            return
+        started.set_result(None)
+        self.loop.run_until_complete(server.serve_forever())
+
+    async def handle(self, reader, writer):
+        """处理一个HTTP连接"""
+        try:
+            status, body = await self.dispatch(reader)
+        except Exception as e:
+            status, body = 500, self.encode({"error": str(e)})
+
+        writer.write(
+            f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: close\r\n"
+            "\r\n".encode("latin-1") + body
+        )
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def dispatch(self, reader):
+        """解析请求并分发到对应接口，返回 (状态码, 响应体)"""
+        request_line = (await reader.readline()).decode("latin-1").split()
+        if len(request_line) != 3:
+            return 400, self.encode({"error": "无效的请求"})
+        method, target, _ = request_line
+
+        # 读取请求头
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        # 只接受来自本机的请求，防止网页跨站请求和DNS重绑定
+        if not self.is_loopback(headers.get("host", "")):
+            return 403, self.encode({"error": "只允许通过本机地址访问"})
+        origin = headers.get("origin")
+        if origin is not None and not self.is_loopback(urlsplit(origin).netloc):
+            return 403, self.encode({"error": "不允许跨站请求"})
+
+        url = urlsplit(target)
+        params = parse_qs(url.query)
+
+        if url.path == "/trophies" and method == "POST":
+            content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+            if content_type != "application/json":
+                return 415, self.encode({"error": "Content-Type必须是application/json"})
+            try:
+                content_length = int(headers.get("content-length", "0"))
+                if content_length < 0:
+                    raise ValueError(content_length)
+            except ValueError:
+                return 400, self.encode({"error": "无效的Content-Length"})
+            if content_length > self.max_body_size:
+                return 413, self.encode({"error": "请求体过大"})
+            try:
+                body = await reader.readexactly(content_length)
+            except asyncio.IncompleteReadError:
+                return 400, self.encode({"error": "请求体不完整"})
+            return await self.add(body)
+
+        routes = {
+            "/trophies": self.query,
+            "/search": self.search,
+            "/stats": self.stats
+        }
+        if url.path not in routes:
+            return 404, self.encode({"error": "接口不存在"})
+        if method != "GET":
+            return 405, self.encode({"error": "不支持的请求方法"})
+
+        # 读取数据快照：先读版本号再读索引，索引更新后版本号才会增加
+        version = self.manager.data_version
+        index = self.manager.index
+        if index is None:
+            return 503, self.encode({"error": "数据尚未加载"})
+
+        if self.cache_version != version:
+            self.cache.clear()
+            self.cache_version = version
+
+        key = (url.path, url.query)
+        if key not in self.cache:
+            try:
+                result = routes[url.path](index, params)
+            except ValueError as e:
+                return 400, self.encode({"error": str(e)})
+            if len(self.cache) >= self.max_cache_entries:
+                self.cache.clear()
+            self.cache[key] = self.encode(result)
+        return 200, self.cache[key]
+
+    def query(self, index, params):
+        """按条件查询"""
+        grades = params.get("grade")
+        min_score = self.get_float(params, "min_score")
+        max_score = self.get_float(params, "max_score")
+        species = params.get("species", [None])[0]
+        color = params.get("color", [None])[0]
+
+        sort_key = params.get("sort", ["species"])[0]
+        if sort_key not in self.sort_keys:
+            raise ValueError(f"不支持的排序键: {sort_key}")
+        ascending = params.get("order", ["asc"])[0] != "desc"
+
+        limit = min(self.get_int(params, "limit", self.default_limit), self.max_limit)
+        offset = self.get_int(params, "offset", 0)
+
+        result = index.query(grades, min_score, max_score, species, color)
+        result = TrophyManager.sort_result(result, sort_key, ascending)
+
+        # 评分统一输出为数字；空单元格和无法解析的评分（NaN）转为null，JSON中不允许出现NaN
+        items = result[self.columns].iloc[offset:offset + limit]
+        items = items.assign(score=pd.to_numeric(items["score"], errors="coerce")).astype(object)
+        items = items.where(pd.notna(items), None)
+
+        return {
+            "total": len(result),
+            "offset": offset,
+            "items": items.to_dict("records")
+        }
+
+    def search(self, index, params):
+        """按物种模糊搜索"""
+        keyword = params.get("q", [""])[0].strip()
+        if not keyword:
+            raise ValueError("缺少搜索关键字 q")
+        return self.query(index, dict(params, species=[keyword]))
+
+    def stats(self, index, params):
+        """统计总数、各等级数量和评分分布"""
+        scores = index.sorted_scores[~np.isnan(index.sorted_scores)]
+        return {
+            "count": index.size,
+            "species": int(index.df["species"].nunique()),
+            "grades": {
+                name: int(index.grade_bitmaps[name].sum()) if name in index.grade_bitmaps else 0
+                for name in self.manager.grades.names
+            },
+            "score": {
+                "min": float(scores[0]) if len(scores) else None,
+                "max": float(scores[-1]) if len(scores) else None,
+                "mean": round(float(scores.mean()), 2) if len(scores) else None
+            }
+        }
+
+    async def add(self, body):
+        """添加战利品"""
+        try:
+            trophy = json.loads(body.decode("utf-8"))
+            values = [trophy[name] for name in ("species", "color", "grade", "score")]
+        except (UnicodeDecodeError, ValueError, TypeError, KeyError):
+            return 400, self.encode({"error": "请求体必须是包含 species、color、grade、score 的JSON对象"})
+
+        # species、color、grade必须是字符串，score可以是字符串或数字
+        if not all(isinstance(value, str) for value in values[:3]) or \
+                isinstance(values[3], bool) or not isinstance(values[3], (str, int, float)):
+            return 400, self.encode({"error": "species、color、grade必须是字符串，score必须是字符串或数字"})
+
+        def add_in_ui():
+            trophy_id = self.manager.add_trophy_record(*values)
+            self.manager.load_data()
+            return trophy_id
+
+        try:
+            trophy_id = await asyncio.wrap_future(self.manager.call_in_ui(add_in_ui))
+        except ValueError as e:
+            return 400, self.encode({"error": str(e)})
+
+        return 201, self.encode({"id": trophy_id})
+
+    @staticmethod
+    def is_loopback(netloc):
+        """判断Host或Origin中的主机是否为本机地址"""
+        host = urlsplit("//" + netloc).hostname
+        return host in ("127.0.0.1", "localhost", "::1")
+
+    @staticmethod
+    def get_float(params, name):
+        """读取浮点数参数"""
+        if name not in params:
+            return None
+        try:
+            return float(params[name][0])
+        except ValueError:
+            raise ValueError(f"参数 {name} 必须是数字")
+
+    @staticmethod
+    def get_int(params, name, default):
+        """读取非负整数参数"""
+        if name not in params:
+            return default
+        try:
+            value = int(params[name][0])
+        except ValueError:
+            raise ValueError(f"参数 {name} 必须是整数")
+        if value < 0:
+            raise ValueError(f"参数 {name} 不能为负数")
+        return value
+
+    @staticmethod
+    def encode(data):
+        """将数据编码为JSON响应体"""
+        return json.dumps(data, ensure_ascii=False, allow_nan=False).encode("utf-8")
+
+
 class TrophyManager:
     def __init__(self, root):
         self.root = root
@@ -29,6 +652,32 @@ class TrophyManager:
 
         self.current_sort = "物种升序"
 
+        # 已加载的全部数据及其查询索引，数据每次重新加载时版本号加一
+        self.data = None
+        self.index = None
+        self.data_version = 0
+
+        # 后台线程提交给界面线程执行的操作
+        self.ui_calls = queue.Queue()
+        self.server = None
+
+        # 当前表格显示的数据（已按搜索和排序处理），供导出使用
+        self.current_view = None
+
+        # 表格分页显示，每页行数和当前页码
+        self.page_size = 500
+        self.current_page = 0
+
+        # 导出格式：显示名称 -> (格式键, 文件扩展名)
+        self.export_formats = {
+            "Parquet": ("parquet", ".parquet"),
+            "JSON Lines": ("jsonl", ".jsonl"),
+            "Excel": ("xlsx", ".xlsx")
+        }
+
+        # 导出时每批写入的行数，保证导出大量数据时内存占用平稳
+        self.export_chunk_size = 50000
+
         # 设置图标
         self.set_window_icon()
 
@@ -45,6 +694,9 @@ class TrophyManager:
         # 加载数据
         self.load_data()
 
+        # 启动本地查询服务
+        self.start_server()
+
     def set_window_icon(self):
         """设置窗口图标"""
         icon_paths = 'icon/COTW.ico'  # resources子目录
@@ -54,9 +706,11 @@ class TrophyManager:
     def load_settings(self):
         """从INI文件加载设置"""
         config = configparser.ConfigParser()
+        config.optionxform = str  # 保留等级名称的大小写
         # 设置默认值
         config[self.settings_section] = {
-            "csv_path": "trophy.csv"
+            "csv_path": "trophy.csv",
+            "server_port": ""
         }
 
         try:
@@ -64,18 +718,24 @@ class TrophyManager:
                 config.read(self.settings_file, encoding="utf-8")
 
             self.settings = {
-                "csv_path": config.get(self.settings_section, "csv_path", fallback="trophies.csv")
+                "csv_path": config.get(self.settings_section, "csv_path", fallback="trophies.csv"),
+                "server_port": config.get(self.settings_section, "server_port", fallback="")
             }
+            self.grades = GradeRegistry.from_config(config)
         except Exception as e:
             print(f"加载设置失败: {e}")
-            self.settings = {"csv_path": "trophies.csv"}
+            self.settings = {"csv_path": "trophies.csv", "server_port": ""}
+            self.grades = GradeRegistry()
 
     def save_settings(self):
         """保存设置到INI文件"""
         config = configparser.ConfigParser()
+        config.optionxform = str  # 保留等级名称的大小写
         config[self.settings_section] = {
-            "csv_path": self.settings["csv_path"]
+            "csv_path": self.settings["csv_path"],
+            "server_port": self.settings["server_port"]
         }
+        self.grades.to_config(config)
 
         try:
             with open(self.settings_file, "w", encoding="utf-8") as f:
@@ -105,6 +765,14 @@ class TrophyManager:
         settings_btn = tk.Button(toolbar, text="设置", command=self.show_settings_dialog)
         settings_btn.pack(side=tk.LEFT, padx=2, pady=2)
 
+        # 导出按钮
+        export_btn = tk.Button(toolbar, text="导出", command=self.show_export_dialog)
+        export_btn.pack(side=tk.LEFT, padx=2, pady=2)
+
+        # 检查按钮
+        check_btn = tk.Button(toolbar, text="检查", command=self.check_data)
+        check_btn.pack(side=tk.LEFT, padx=2, pady=2)
+
         # 搜索框
         search_frame = tk.Frame(toolbar)
         search_frame.pack(side=tk.LEFT, padx=5)
@@ -137,9 +805,62 @@ class TrophyManager:
         self.sort_menu.pack(side=tk.LEFT, padx=2)
         self.sort_menu.bind("<<ComboboxSelected>>", self.change_sort_method)
 
+        # 筛选栏
+        self.create_filter_bar()
+
+        # 分页栏（需先于表格放置在底部）
+        self.create_pager()
+
         # 数据表格
         self.create_table()
 
+    def create_filter_bar(self):
+        """创建筛选栏：等级、评分范围和毛色"""
+        filter_bar = tk.Frame(self.root, bd=1, relief=tk.RAISED)
+        filter_bar.pack(side=tk.TOP, fill=tk.X)
+
+        # 等级多选
+        tk.Label(filter_bar, text="等级:").pack(side=tk.LEFT, padx=(5, 0))
+        self.grade_filter_vars = {}
+        for grade in self.grades.names:
+            var = tk.BooleanVar(self.root, value=True)
+            tk.Checkbutton(filter_bar, text=grade, variable=var, command=self.search_data).pack(side=tk.LEFT)
+            self.grade_filter_vars[grade] = var
+
+        # 评分范围
+        tk.Label(filter_bar, text="评分:").pack(side=tk.LEFT, padx=(10, 0))
+        self.min_score_entry = tk.Entry(filter_bar, width=8)
+        self.min_score_entry.pack(side=tk.LEFT, padx=2)
+        tk.Label(filter_bar, text="至").pack(side=tk.LEFT)
+        self.max_score_entry = tk.Entry(filter_bar, width=8)
+        self.max_score_entry.pack(side=tk.LEFT, padx=2)
+
+        # 毛色
+        tk.Label(filter_bar, text="毛色:").pack(side=tk.LEFT, padx=(10, 0))
+        self.color_filter_entry = tk.Entry(filter_bar, width=12)
+        self.color_filter_entry.pack(side=tk.LEFT, padx=2)
+
+        # 绑定Enter键事件
+        for entry in (self.min_score_entry, self.max_score_entry, self.color_filter_entry):
+            entry.bind("<Return>", lambda event: self.search_data())
+
+        tk.Button(filter_bar, text="筛选", command=self.search_data).pack(side=tk.LEFT, padx=2, pady=2)
+        tk.Button(filter_bar, text="重置", command=self.reset_filters).pack(side=tk.LEFT, padx=2, pady=2)
+
+    def create_pager(self):
+        """创建分页栏"""
+        pager = tk.Frame(self.root)
+        pager.pack(side=tk.BOTTOM, fill=tk.X, padx=5)
+
+        prev_btn = tk.Button(pager, text="上一页", command=lambda: self.show_page(self.current_page - 1))
+        prev_btn.pack(side=tk.LEFT, padx=2, pady=2)
+
+        next_btn = tk.Button(pager, text="下一页", command=lambda: self.show_page(self.current_page + 1))
+        next_btn.pack(side=tk.LEFT, padx=2, pady=2)
+
+        self.page_label = tk.Label(pager, text="")
+        self.page_label.pack(side=tk.LEFT, padx=5)
+
     def create_table(self):
         """创建数据表格"""
         # 表格框架
@@ -185,8 +906,8 @@ class TrophyManager:
         style.configure("Treeview.Heading", font=self.header_font_style)
         style.configure("Treeview", font=self.font_style, rowheight=25)
 
-        # 绑定双击事件
-        self.table.bind("<Double-1>", self.on_row_double_click)
+        # 设置各等级的行颜色
+        self.grades.configure_tags(self.table)
 
         # 绑定双击事件
         self.table.bind("<Double-1>", self.on_row_double_click)
@@ -202,168 +923,187 @@ class TrophyManager:
     def change_sort_method(self, event=None):
         """更改排序方法"""
         self.current_sort = self.sort_var.get()
-        self.load_data()
+        self.refresh_view()
 
     def load_data(self):
-        """从CSV文件加载数据并显示在表格中"""
+        """从CSV文件加载数据并显示在表格中，加载失败时保留之前的数据"""
         try:
-            # 清空表格
-            for item in self.table.get_children():
-                self.table.delete(item)
-
             # 检查文件是否存在
             if not os.path.exists(self.settings["csv_path"]):
                 # 如果文件不存在，创建一个空的
                 with open(self.settings["csv_path"], "w", encoding="utf-8-sig", newline="") as f:
                     writer = csv.writer(f)
                     writer.writerow(["species", "color", "grade", "score", "id"])
-                return
 
             # 读取CSV文件
             df = pd.read_csv(self.settings["csv_path"], encoding="utf-8-sig")
 
-            # 获取当前排序方式
-            sort_key, ascending = self.sort_options[self.current_sort]
-
-            # 添加拼音列用于排序
-            df['pinyin'] = df['species'].apply(
-                lambda x: ''.join([i[0] for i in pinyin(x, style=Style.FIRST_LETTER)]))
-
-            # 定义等级排序权重
-            grade_order = {
-                "珍禽异兽": 5,
-                "钻石": 4,
-                "黄金": 3,
-                "白银": 2,
-                "青铜": 1
+            # 添加拼音列用于排序（同一物种只计算一次）
+            species_pinyin = {
+                species: ''.join([i[0] for i in pinyin(species, style=Style.FIRST_LETTER)])
+                for species in df['species'].dropna().unique()
             }
-            df['grade_weight'] = df['grade'].map(grade_order)
-
-            # 根据排序键选择排序列
-            if sort_key == "species":
-                sort_col = 'pinyin'
-            elif sort_key == "grade":
-                sort_col = 'grade_weight'
-            else:
-                sort_col = sort_key
-
-            # 主排序
-            df_sorted = df.sort_values(
-                sort_col,
-                ascending=ascending,
-                kind='mergesort'  # 保持排序稳定性
-            )
+            df['pinyin'] = df['species'].map(species_pinyin)
+
+            # 添加等级排序权重
+            df['grade_weight'] = df['grade'].map(self.grades.weights)
 
-            # # 次级排序（等级降序、评分降序、ID升序）
-            # df_sorted = df_sorted.sort_values(
-            #     ['grade_weight', 'score', 'id'],
-            #     ascending=[False, False, True],
-            #     kind='mergesort'
-            # )
+            # 预先计算表格显示用的列：两位小数的评分和等级颜色标签
+            scores = pd.to_numeric(df['score'], errors='coerce').to_numpy(dtype=float)
+            df['score_value'] = scores  # 按评分排序时使用数值，无法解析的评分为NaN
+            df['score_text'] = np.where(np.isnan(scores), "", np.char.mod("%.2f", scores))
+            df['tags'] = [self.grades.tags.get(grade, ()) for grade in df['grade']]
 
-            # 添加数据到表格
-            for _, row in df_sorted.iterrows():
-                self.add_row_to_table(row)
+            # 建立查询索引，全部完成后再替换，查询服务在加载期间仍可读取旧数据
+            index = TrophyIndex(df)
+            self.data = df
+            self.index = index
+            self.data_version += 1
 
         except Exception as e:
             messagebox.showerror("错误", f"加载数据失败: {e}")
 
-    def add_row_to_table(self, row):
-        """添加一行数据到表格"""
-        grade = row["grade"]
-        # 根据等级设置颜色
-        color = {
-            "青铜": "#CD7F32",
-            "白银": "#C0C0C0",
-            "黄金": "#FFD700",
-            "钻石": "#B9F2FF",
-            "珍禽异兽": "#800080"
-        }.get(grade, "black")
+        self.refresh_view()
 
-        # 格式化评分为两位小数
-        score = "{:.2f}".format(float(row["score"]))
-
-        self.table.insert("", tk.END, values=(
-            row["species"],
-            row["color"],
-            grade,
-            score,
-            row["id"]
-        ), tags=(color,))
-
-        # 设置行颜色
-        self.table.tag_configure("#CD7F32", foreground="#CD7F32")
-        self.table.tag_configure("#C0C0C0", foreground="#C0C0C0")
-        self.table.tag_configure("#FFD700", foreground="#FFD700")
-        self.table.tag_configure("#B9F2FF", foreground="#B9F2FF")
-        self.table.tag_configure("#800080", foreground="#800080")
+    def refresh_view(self):
+        """按当前筛选条件和排序方式刷新表格，并回到第一页"""
+        self.current_view = None
 
-    def search_data(self):
-        """搜索数据"""
-        keyword = self.search_entry.get().strip()
-        if not keyword:
-            self.load_data()
+        if self.index is None:
+            self.show_page(0)
             return
 
-        try:
-            # 清空表格
-            for item in self.table.get_children():
-                self.table.delete(item)
-
-            # 读取CSV文件
-            df = pd.read_csv(self.settings["csv_path"], encoding="utf-8-sig")
+        filters = self.get_filters()
+        if filters is None:
+            self.show_page(0)
+            return
 
-            # 模糊搜索
-            mask = df["species"].str.contains(keyword, case=False, na=False)
-            result = df.loc[mask].copy()
+        try:
+            # 通过索引筛选数据
+            result = self.index.query(**filters)
 
             # 获取当前排序方式
             sort_key, ascending = self.sort_options.get(
                 self.current_sort, ("species", True)  # 默认按物种拼音升序
             )
+            result_sorted = self.sort_result(result, sort_key, ascending)
 
-            # 添加拼音列用于排序
-            result['pinyin'] = result['species'].apply(
-                lambda x: ''.join([i[0] for i in pinyin(x, style=Style.FIRST_LETTER)]))
-
-            # 定义等级排序权重
-            grade_order = {
-                "珍禽异兽": 5,
-                "钻石": 4,
-                "黄金": 3,
-                "白银": 2,
-                "青铜": 1
-            }
-            result['grade_weight'] = result['grade'].map(grade_order)
-
-            # 根据排序键选择排序列
-            if sort_key == "species":
-                sort_col = 'pinyin'
-            elif sort_key == "grade":
-                sort_col = 'grade_weight'
-            else:
-                sort_col = sort_key
-
-            # 主排序
-            result_sorted = result.sort_values(
-                sort_col,
-                ascending=ascending,
-                kind='mergesort'
-            )
+            self.current_view = result_sorted
 
-            # 次级排序（等级降序、评分降序、ID升序）
-            result_sorted = result_sorted.sort_values(
-                ['grade_weight', 'score', 'id'],
-                ascending=[False, False, True],
-                kind='mergesort'
-            )
+        except Exception as e:
+            messagebox.showerror("错误", f"显示数据失败: {e}")
+
+        self.show_page(0)
+
+    def show_page(self, page):
+        """在表格中显示当前视图的指定页"""
+        total = 0 if self.current_view is None else len(self.current_view)
+        page_count = max((total + self.page_size - 1) // self.page_size, 1)
+        self.current_page = min(max(page, 0), page_count - 1)
+
+        # 清空表格
+        self.table.delete(*self.table.get_children())
+
+        if total:
+            start = self.current_page * self.page_size
+            rows = self.current_view.iloc[start:start + self.page_size]
+
+            # 添加数据到表格，行颜色使用预先计算的等级标签
+            columns = ["species", "color", "grade", "score_text", "id", "tags"]
+            insert = self.table.insert
+            for species, color, grade, score, trophy_id, tags in rows[columns].itertuples(index=False, name=None):
+                insert("", tk.END, values=(species, color, grade, score, trophy_id), tags=tags)
+
+        self.page_label.config(text=f"第 {self.current_page + 1}/{page_count} 页，共 {total} 个战利品")
+
+    @staticmethod
+    def sort_result(result, sort_key, ascending):
+        """按排序键排序数据"""
+        # 根据排序键选择排序列
+        if sort_key == "species":
+            sort_col = 'pinyin'
+        elif sort_key == "grade":
+            sort_col = 'grade_weight'
+        elif sort_key == "score":
+            sort_col = 'score_value'
+        else:
+            sort_col = sort_key
 
-            # 添加数据到表格
-            for _, row in result_sorted.iterrows():
-                self.add_row_to_table(row)
+        # 主排序
+        return result.sort_values(
+            sort_col,
+            ascending=ascending,
+            kind='mergesort'  # 保持排序稳定性
+        )
+
+    def get_filters(self):
+        """从搜索框和筛选栏读取筛选条件，输入无效时返回None"""
+        grades = [grade for grade, var in self.grade_filter_vars.items() if var.get()]
 
+        try:
+            min_text = self.min_score_entry.get().strip()
+            max_text = self.max_score_entry.get().strip()
+            min_score = float(min_text) if min_text else None
+            max_score = float(max_text) if max_text else None
+        except ValueError:
+            messagebox.showerror("错误", "评分范围必须是数字")
+            return None
+
+        return {
+            # 全部等级都勾选时不需要按等级筛选
+            "grades": None if len(grades) == len(self.grade_filter_vars) else grades,
+            "min_score": min_score,
+            "max_score": max_score,
+            "species": self.search_entry.get().strip() or None,
+            "color": self.color_filter_entry.get().strip() or None
+        }
+
+    def search_data(self):
+        """搜索数据"""
+        self.refresh_view()
+
+    def reset_filters(self):
+        """清除搜索和筛选条件"""
+        self.search_entry.delete(0, tk.END)
+        self.color_filter_entry.delete(0, tk.END)
+        self.min_score_entry.delete(0, tk.END)
+        self.max_score_entry.delete(0, tk.END)
+        for var in self.grade_filter_vars.values():
+            var.set(True)
+        self.refresh_view()
+
+    def check_data(self):
+        """检查数据文件完整性，发现问题时询问是否修复"""
+        if not os.path.exists(self.settings["csv_path"]):
+            messagebox.showwarning("警告", "数据文件不存在")
+            return
+
+        validator = TrophyValidator(self.settings["csv_path"], self.grades.names)
+        try:
+            issues = validator.check()
         except Exception as e:
-            messagebox.showerror("错误", f"搜索数据失败: {e}")
+            messagebox.showerror("错误", f"检查数据失败: {e}")
+            return
+
+        report = TrophyValidator.format_report(issues, validator.notices)
+        if not issues:
+            messagebox.showinfo("检查结果", report)
+            return
+
+        if not messagebox.askyesno(
+                "检查结果",
+                f"{report}\n\n是否修复？原文件将备份为 .bak，无法修复的行将保存到 .rejected.csv，"
+                "完全重复的行将被删除"):
+            return
+
+        try:
+            validator.repair()
+        except Exception as e:
+            messagebox.showerror("错误", f"修复数据失败: {e}")
+            return
+
+        self.load_data()
+        messagebox.showinfo("成功", "数据已修复")
 
     def get_next_id(self):
         """获取下一个可用的ID（当前最大ID + 1）"""
@@ -412,8 +1152,8 @@ class TrophyManager:
         # 等级
         tk.Label(dialog, text="等级:").grid(row=2, column=0, padx=5, pady=5, sticky=tk.E)
         grade_var = tk.StringVar(dialog)
-        grade_var.set("青铜")
-        grade_menu = tk.OptionMenu(dialog, grade_var, "青铜", "白银", "黄金", "钻石", "珍禽异兽")
+        grade_var.set(self.grades.names[0])
+        grade_menu = tk.OptionMenu(dialog, grade_var, *self.grades.names)
         grade_menu.grid(row=2, column=1, padx=5, pady=5, sticky=tk.W)
 
         # 评分
@@ -427,49 +1167,63 @@ class TrophyManager:
 
         def add_trophy():
             """添加战利品"""
-            species = species_entry.get().strip()
-            color = color_entry.get().strip()
-            grade = grade_var.get()
-            score = score_entry.get().strip()
-
-            # 验证数据
-            if not species or not color or not score:
-                messagebox.showerror("错误", "所有字段都必须填写")
-                return
-
             try:
-                score = float(score)
-                if score < 0:
-                    raise ValueError("评分不能为负数")
-            except ValueError:
-                messagebox.showerror("错误", "评分必须是数字且不小于0")
+                self.add_trophy_record(
+                    species_entry.get(),
+                    color_entry.get(),
+                    grade_var.get(),
+                    score_entry.get()
+                )
+            except ValueError as e:
+                messagebox.showerror("错误", str(e))
+                return
+            except Exception as e:
+                messagebox.showerror("错误", f"保存数据失败: {e}")
                 return
 
-            # 获取下一个ID
-            next_id = self.get_next_id()
+            # 刷新表格
+            self.load_data()
+            dialog.destroy()
 
-            # 格式化评分为两位小数
-            score = "{:.2f}".format(score)
+        tk.Button(button_frame, text="确认", command=add_trophy).pack(side=tk.LEFT, padx=5)
+        tk.Button(button_frame, text="取消", command=dialog.destroy).pack(side=tk.LEFT, padx=5)
 
-            # 写入CSV文件
-            try:
-                file_exists = os.path.exists(self.settings["csv_path"]) and os.path.getsize(
-                    self.settings["csv_path"]) > 0
-                with open(self.settings["csv_path"], "a", encoding="utf-8-sig", newline="") as f:
-                    writer = csv.writer(f)
-                    if not file_exists:
-                        writer.writerow(["species", "color", "grade", "score", "id"])
-                    writer.writerow([species, color, grade, score, next_id])
+    def add_trophy_record(self, species, color, grade, score):
+        """校验并追加一条战利品记录，返回新记录的ID，数据无效时抛出ValueError"""
+        species = str(species).strip()
+        color = str(color).strip()
+        score = str(score).strip()
 
-                # 刷新表格
-                self.load_data()
-                dialog.destroy()
+        # 验证数据
+        if not species or not color or not score:
+            raise ValueError("所有字段都必须填写")
 
-            except Exception as e:
-                messagebox.showerror("错误", f"保存数据失败: {e}")
+        if grade not in self.grades.weights:
+            raise ValueError(f"未知的等级: {grade}")
 
-        tk.Button(button_frame, text="确认", command=add_trophy).pack(side=tk.LEFT, padx=5)
-        tk.Button(button_frame, text="取消", command=dialog.destroy).pack(side=tk.LEFT, padx=5)
+        try:
+            score = float(score)
+        except ValueError:
+            raise ValueError("评分必须是数字且不小于0")
+        if not math.isfinite(score) or score < 0:
+            raise ValueError("评分必须是数字且不小于0")
+
+        # 获取下一个ID
+        next_id = self.get_next_id()
+
+        # 格式化评分为两位小数
+        score = "{:.2f}".format(score)
+
+        # 写入CSV文件
+        file_exists = os.path.exists(self.settings["csv_path"]) and os.path.getsize(
+            self.settings["csv_path"]) > 0
+        with open(self.settings["csv_path"], "a", encoding="utf-8-sig", newline="") as f:
+            writer = csv.writer(f)
+            if not file_exists:
+                writer.writerow(["species", "color", "grade", "score", "id"])
+            writer.writerow([species, color, grade, score, next_id])
+
+        return next_id
 
     def delete_selected(self):
         """删除选中的一条或多条记录"""
@@ -601,7 +1355,7 @@ class TrophyManager:
         tk.Label(dialog, text="等级:").grid(row=3, column=0, padx=5, pady=5, sticky=tk.E)
         grade_var = tk.StringVar(dialog)
         grade_var.set(values[2])
-        grade_menu = tk.OptionMenu(dialog, grade_var, "青铜", "白银", "黄金", "钻石", "珍禽异兽")
+        grade_menu = tk.OptionMenu(dialog, grade_var, *self.grades.names)
         grade_menu.grid(row=3, column=1, padx=5, pady=5, sticky=tk.W)
 
         # 评分（可修改）
@@ -736,6 +1490,238 @@ class TrophyManager:
         tk.Button(button_frame, text="确认", command=save_settings).pack(side=tk.LEFT, padx=5)
         tk.Button(button_frame, text="取消", command=dialog.destroy).pack(side=tk.LEFT, padx=5)
 
+    def show_export_dialog(self):
+        """显示导出对话框"""
+        if self.current_view is None or self.current_view.empty:
+            messagebox.showwarning("警告", "当前没有可导出的数据")
+            return
+
+        dialog = tk.Toplevel(self.root)
+        dialog.title("导出")
+        dialog.transient(self.root)
+        dialog.grab_set()
+
+        # 设置对话框尺寸并居中
+        dialog_width = 460
+        dialog_height = 220
+        self.center_window(dialog, dialog_width, dialog_height)
+
+        # 导出格式
+        tk.Label(dialog, text="格式:").grid(row=0, column=0, padx=5, pady=5, sticky=tk.E)
+        format_var = tk.StringVar(dialog)
+        format_var.set("Parquet")
+        format_menu = tk.OptionMenu(dialog, format_var, *self.export_formats.keys())
+        format_menu.grid(row=0, column=1, columnspan=5, padx=5, pady=5, sticky=tk.W)
+
+        # 导出列
+        tk.Label(dialog, text="列:").grid(row=1, column=0, padx=5, pady=5, sticky=tk.E)
+        column_labels = {"species": "物种", "color": "毛色", "grade": "等级", "score": "评分", "id": "ID"}
+        column_vars = {}
+        for i, (column, label) in enumerate(column_labels.items()):
+            var = tk.BooleanVar(dialog, value=True)
+            tk.Checkbutton(dialog, text=label, variable=var).grid(row=1, column=i + 1, sticky=tk.W)
+            column_vars[column] = var
+
+        # 等级筛选
+        tk.Label(dialog, text="等级:").grid(row=2, column=0, padx=5, pady=5, sticky=tk.E)
+        grade_vars = {}
+        for i, grade in enumerate(self.grades.names):
+            var = tk.BooleanVar(dialog, value=True)
+            tk.Checkbutton(dialog, text=grade, variable=var).grid(row=2, column=i + 1, sticky=tk.W)
+            grade_vars[grade] = var
+
+        # 评分范围
+        tk.Label(dialog, text="评分:").grid(row=3, column=0, padx=5, pady=5, sticky=tk.E)
+        score_frame = tk.Frame(dialog)
+        score_frame.grid(row=3, column=1, columnspan=5, padx=5, pady=5, sticky=tk.W)
+        min_score_entry = tk.Entry(score_frame, width=10)
+        min_score_entry.pack(side=tk.LEFT)
+        tk.Label(score_frame, text="至").pack(side=tk.LEFT, padx=2)
+        max_score_entry = tk.Entry(score_frame, width=10)
+        max_score_entry.pack(side=tk.LEFT)
+
+        # 按钮
+        button_frame = tk.Frame(dialog)
+        button_frame.grid(row=4, column=0, columnspan=6, pady=5)
+
+        def do_export():
+            """执行导出"""
+            columns = [column for column, var in column_vars.items() if var.get()]
+            grades = [grade for grade, var in grade_vars.items() if var.get()]
+
+            if not columns:
+                messagebox.showerror("错误", "至少选择一列")
+                return
+
+            if not grades:
+                messagebox.showerror("错误", "至少选择一个等级")
+                return
+
+            # 验证评分范围
+            try:
+                min_text = min_score_entry.get().strip()
+                max_text = max_score_entry.get().strip()
+                min_score = float(min_text) if min_text else None
+                max_score = float(max_text) if max_text else None
+            except ValueError:
+                messagebox.showerror("错误", "评分范围必须是数字")
+                return
+
+            fmt, extension = self.export_formats[format_var.get()]
+            path = filedialog.asksaveasfilename(
+                defaultextension=extension,
+                filetypes=[(format_var.get(), "*" + extension)],
+                initialfile="trophies" + extension
+            )
+            if not path:
+                return
+
+            try:
+                count = self.export_data(path, fmt, columns, grades, min_score, max_score)
+            except ImportError as e:
+                messagebox.showerror("错误", f"缺少导出所需的依赖: {e.name}")
+                return
+            except Exception as e:
+                messagebox.showerror("错误", f"导出失败: {e}")
+                return
+
+            dialog.destroy()
+            messagebox.showinfo("成功", f"已导出 {count} 个战利品")
+
+        tk.Button(button_frame, text="确认", command=do_export).pack(side=tk.LEFT, padx=5)
+        tk.Button(button_frame, text="取消", command=dialog.destroy).pack(side=tk.LEFT, padx=5)
+
+    def iter_export_chunks(self, columns, grades=None, min_score=None, max_score=None):
+        """按批次生成当前视图中符合筛选条件的数据"""
+        view = self.current_view
+        for start in range(0, len(view), self.export_chunk_size):
+            chunk = view.iloc[start:start + self.export_chunk_size]
+
+            # 评分统一转为数字，无法解析的评分记为NaN，不会落入任何评分范围
+            chunk = chunk.assign(score=pd.to_numeric(chunk["score"], errors="coerce"))
+
+            # 在每个批次内筛选，避免为整个视图生成副本
+            mask = pd.Series(True, index=chunk.index)
+            if grades is not None:
+                mask &= chunk["grade"].isin(grades)
+            if min_score is not None:
+                mask &= chunk["score"] >= min_score
+            if max_score is not None:
+                mask &= chunk["score"] <= max_score
+
+            chunk = chunk.loc[mask, columns]
+            if not chunk.empty:
+                yield chunk
+
+    def export_data(self, path, fmt, columns, grades=None, min_score=None, max_score=None):
+        """将当前视图导出到文件，返回导出的行数"""
+        chunks = self.iter_export_chunks(columns, grades, min_score, max_score)
+
+        if fmt == "parquet":
+            return self.write_parquet(path, chunks, columns)
+        elif fmt == "jsonl":
+            return self.write_jsonl(path, chunks)
+        elif fmt == "xlsx":
+            return self.write_xlsx(path, chunks, columns)
+        else:
+            raise ValueError(f"不支持的导出格式: {fmt}")
+
+    def write_parquet(self, path, chunks, columns):
+        """分批写入Parquet文件"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        # 固定每列类型，保证各批次的结构一致
+        column_types = {
+            "species": pa.string(),
+            "color": pa.string(),
+            "grade": pa.string(),
+            "score": pa.float64(),
+            "id": pa.int64()
+        }
+        schema = pa.schema([(column, column_types[column]) for column in columns])
+
+        count = 0
+        with pq.ParquetWriter(path, schema) as writer:
+            for chunk in chunks:
+                writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+                count += len(chunk)
+        return count
+
+    def write_jsonl(self, path, chunks):
+        """分批写入JSON Lines文件"""
+        count = 0
+        with open(path, "w", encoding="utf-8") as f:
+            for chunk in chunks:
+                text = chunk.to_json(orient="records", lines=True, force_ascii=False)
+                if not text.endswith("\n"):
+                    text += "\n"
+                f.write(text)
+                count += len(chunk)
+        return count
+
+    def write_xlsx(self, path, chunks, columns):
+        """以只写模式分批写入Excel文件，超出单表行数上限时自动新建工作表"""
+        from openpyxl import Workbook
+
+        max_rows = 1048576  # Excel单个工作表的行数上限（含表头）
+
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet("trophies")
+        sheet.append(columns)
+        sheet_rows = 1
+
+        count = 0
+        for chunk in chunks:
+            for row in chunk.itertuples(index=False, name=None):
+                if sheet_rows >= max_rows:
+                    sheet = workbook.create_sheet(f"trophies_{len(workbook.worksheets)}")
+                    sheet.append(columns)
+                    sheet_rows = 1
+                sheet.append(list(row))
+                sheet_rows += 1
+            count += len(chunk)
+
+        workbook.save(path)
+        return count
+
+    def start_server(self):
+        """按设置启动本地查询服务，未设置端口时不启动"""
+        port = self.settings["server_port"].strip()
+        if not port:
+            return
+
+        try:
+            self.server = TrophyServer(self, port=int(port))
+            self.server.start()
+        except Exception as e:
+            self.server = None
+            messagebox.showwarning("警告", f"启动查询服务失败（端口 {port}）: {e}")
+            return
+
+        self.process_ui_calls()
+
+    def call_in_ui(self, func):
+        """从后台线程提交操作到界面线程执行，返回concurrent.futures.Future"""
+        future = concurrent.futures.Future()
+        self.ui_calls.put((func, future))
+        return future
+
+    def process_ui_calls(self):
+        """在界面线程中执行后台线程提交的操作"""
+        while True:
+            try:
+                func, future = self.ui_calls.get_nowait()
+            except queue.Empty:
+                break
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(func())
+                except Exception as e:
+                    future.set_exception(e)
+
+        self.root.after(100, self.process_ui_calls)
+
     def center_window(self, window, width=None, height=None):
         """将窗口居中显示在父窗口中心"""
         window.update_idletasks()  # 确保窗口尺寸已更新
@@ -760,7 +1746,42 @@ class TrophyManager:
             window.geometry(f"+{x}+{y}")
 
 
+def run_check(args):
+    """命令行模式：检查（并可选修复）数据文件
+
+    退出码：0 没有问题（或已全部修复）；1 发现问题（或有无法修复的行）；2 无法读取文件
+    """
+    config = configparser.ConfigParser()
+    config.optionxform = str  # 保留等级名称的大小写
+    config.read("settings.ini", encoding="utf-8")
+    csv_path = args.csv
+    if csv_path is None:
+        csv_path = config.get("TrophyManager", "csv_path", fallback="trophy.csv")
+
+    validator = TrophyValidator(csv_path, GradeRegistry.from_config(config).names)
+    try:
+        issues = validator.repair() if args.repair else validator.check()
+    except (OSError, ValueError, csv.Error) as e:
+        print(f"无法检查数据文件 {csv_path}: {e}", file=sys.stderr)
+        return 2
+
+    print(TrophyValidator.format_report(issues, validator.notices))
+    if args.repair:
+        # 修复后仍有无法修复的行时返回1
+        return 1 if validator.rejected_count else 0
+    return 1 if issues else 0
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="战利品管理器")
+    parser.add_argument("--check", action="store_true", help="检查数据文件完整性后退出")
+    parser.add_argument("--repair", action="store_true", help="检查并修复数据文件后退出")
+    parser.add_argument("--csv", help="数据文件路径，默认使用settings.ini中的设置")
+    args = parser.parse_args()
+
+    if args.check or args.repair:
+        sys.exit(run_check(args))
+
     root = tk.Tk()
     app = TrophyManager(root)
     root.mainloop()
\ No newline at end of file